@@ -1,28 +1,44 @@
 import dash
-from dash import dcc, html, page_registry, page_container
+from dash import html
 import dash_bootstrap_components as dbc
 
-import plotly.express as px     # pip install plotly==5.2.2
-from plotly import graph_objs as go
-from plotly.subplots import make_subplots
-# this helps us get the theme settings
+# only needed here to pick the JSON engine; figures are built in the pages
 import plotly.io as plt_io
 import os
-import sqlite3
-# --------------------------
-# DATABASE INITIALIZATION
-# --------------------------
-BASE_DIR = os.path.dirname(__file__)
-DB_PATH = os.path.join(BASE_DIR, "./Data/RDBMS/malaysian_youtube_banks_sentiment_deduplicated.db")
+import orjson
+from flask.json.provider import DefaultJSONProvider
 
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
+from cache import cache
 
 
 
 app = dash.Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.SPACELAB])
 server = app.server
 
+# Serialize figures/callback payloads with orjson (much faster on numeric arrays)
+plt_io.json.config.default_engine = "orjson"
+
+
+class OrJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, falling back to Flask's defaults for extra types."""
+
+    def dumps(self, obj, **kwargs):
+        # OPT_NON_STR_KEYS stringifies int/float/etc. dict keys like stdlib json does
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        ).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+server.json = OrJSONProvider(server)
+
+# In-memory memoization for pure callback computations
+cache.init_app(server, config={"CACHE_TYPE": "SimpleCache", "CACHE_DEFAULT_TIMEOUT": 600})
+
 sidebar = dbc.Nav(
             [
                 dbc.NavLink(
@@ -64,8 +80,8 @@ app.layout = dbc.Container([
 ], fluid=True)
 
 
+# Production runs under gunicorn (see Procfile / render.yaml); this is for local use
 if __name__ == "__main__":
-    # app.run_server(debug=False)
-    app.run_server(host="0.0.0.0", port=int(os.environ.get("PORT", 8050)))
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8050)), debug=False)
 
 
@@ -0,0 +1,5 @@
+# cache.py
+from flask_caching import Cache
+
+# Bound to the Flask server in app.py; pages import it to memoize callback work
+cache = Cache()
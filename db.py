@@ -0,0 +1,42 @@
+# db.py
+import functools
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+# --------------------------
+# DATABASE INITIALIZATION
+# --------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "Data", "RDBMS", "malaysian_youtube_banks_sentiment_deduplicated.db")
+
+# Pooled connections, one per checkout: gunicorn's gthread workers run callbacks on
+# 8 threads, and a single shared sqlite3 connection would be rolled back under them
+ENGINE = create_engine(
+    f"sqlite:///{DB_PATH}",
+    poolclass=QueuePool,
+    pool_size=8,
+    connect_args={"check_same_thread": False},
+)
+
+
+@event.listens_for(ENGINE, "connect")
+def _set_sqlite_pragmas(dbapi_conn, _):
+    """Per-connection read tuning; the app never writes, so the file itself is left as-is."""
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-32000")
+    cursor.close()
+
+
+# gunicorn --preload forks after import; give each worker its own connection
+os.register_at_fork(after_in_child=lambda: ENGINE.dispose(close=False))
+
+
+@functools.cache
+def get_lc_db():
+    """LangChain wrapper over the same engine, built on first use by the Query Assistant."""
+    # Imported here so app startup doesn't pay for LangChain
+    from langchain_community.utilities import SQLDatabase
+    return SQLDatabase(engine=ENGINE, sample_rows_in_table_info=0)
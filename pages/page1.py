@@ -1,51 +1,56 @@
 # pages/page1.py
 import dash
-from dash import html, dcc, Input, Output, State, dash_table
+from dash import html, dcc, Input, Output, State
+import dash_ag_grid as dag
 import dash_bootstrap_components as dbc
+import functools
 import os
 import re
+import threading
 import traceback
+import numpy as np
 import pandas as pd
 import ast
+import sqlglot
+from sqlglot import exp
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from db import ENGINE, get_lc_db
 
-from langchain_community.utilities import SQLDatabase
-from langchain_openai import ChatOpenAI
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+# LangChain / OpenAI / HuggingFace are imported inside the functions below,
+# so other pages don't pay their import cost at app startup
 
 
 # -------------------------------------------------------
-# 1️⃣ Load environment and connect database
+# 1️⃣ Load environment (database lives in db.py)
 # -------------------------------------------------------
 load_dotenv()
 
-db = SQLDatabase.from_uri(
-    "sqlite:///./Data/RDBMS/malaysian_youtube_banks_sentiment_deduplicated.db",
-    sample_rows_in_table_info=0
-)
-
 
 # -------------------------------------------------------
 # 2️⃣ Utility Functions
 # -------------------------------------------------------
+@functools.cache
+def _schema_text():
+    # Schema reflection is static for the lifetime of the app, so read it once
+    return get_lc_db().get_table_info()
+
+
+# Not memoized itself: RunnablePassthrough.assign calls it with the (unhashable) input dict
 def get_schema(_=None):
     """Return database schema for the LLM to understand table structures."""
-    return db.get_table_info()
+    return _schema_text()
+
+
+# Markdown fences (optionally tagged sql) and a leading "SQL Query:" label
+_FENCE_RE = re.compile(r"```(?:sql)?\s*|SQL Query:\s*", re.IGNORECASE)
 
 
 def clean_sql_output(text: str) -> str:
     """Sanitize LLM SQL output by removing markdown and formatting artifacts."""
-    cleaned = re.sub(r"```(sql)?", "", text, flags=re.IGNORECASE)
-    cleaned = cleaned.replace("```", "")
-    cleaned = cleaned.replace("SQL Query:", "")
-    cleaned = cleaned.strip()
-    if not cleaned.endswith(";"):
-        cleaned += ";"
-    return cleaned
+    cleaned = _FENCE_RE.sub("", text).strip()
+    return cleaned if cleaned.endswith(";") else cleaned + ";"
 
 
 def run_query(query: str):
@@ -53,19 +58,54 @@ def run_query(query: str):
     query = clean_sql_output(query)
     print(f"\n🧩 Clean SQL being run:\n{query}\n")
     try:
-        return db.run(query)
+        return get_lc_db().run(query)
         # return pd.read_sql(query, db)
     except Exception as e:
         print(f"❌ Database execution error:\n{e}")
         raise
 
 
+MANUAL_ROW_LIMIT = 10000
+
+
+def apply_row_limit(query: str, limit: int = MANUAL_ROW_LIMIT) -> str:
+    """Append a LIMIT to a SELECT that has none, so manual queries can't read unbounded rows."""
+    try:
+        trees = [t for t in sqlglot.parse(query, read="sqlite") if t is not None]
+    except sqlglot.errors.SqlglotError:
+        return query
+    # Leave multi-statement or unparsable input alone so the database reports the error
+    if len(trees) != 1:
+        return query
+    tree = trees[0]
+    if not isinstance(tree, exp.Query) or tree.args.get("limit"):
+        return query
+    return tree.limit(limit).sql(dialect="sqlite") + ";"
+
+
+def read_sql_capped(query: str, limit: int = MANUAL_ROW_LIMIT, chunksize: int = 5000):
+    """Read a query in chunks up to ``limit`` rows; return ``(df, truncated)``."""
+    chunks, rows = [], 0
+    with ENGINE.connect() as conn:
+        for chunk in pd.read_sql(query, conn, chunksize=chunksize):
+            chunks.append(chunk)
+            rows += len(chunk)
+            # Read one row past the cap so we know whether anything was dropped
+            if rows > limit:
+                break
+    if not chunks:
+        return pd.DataFrame(), False
+    return pd.concat(chunks, ignore_index=True).head(limit), rows > limit
+
+
 # -------------------------------------------------------
 # 3️⃣ Model Selector
 # -------------------------------------------------------
 def get_llm(load_from_hugging_face=False):
     """Return the desired LLM interface (OpenAI or HuggingFace)."""
     if load_from_hugging_face:
+        from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+
         api_key = os.environ.get("OPENROUTER_API_KEY")
         if not api_key:
             raise ValueError("Missing OPENROUTER_API_KEY environment variable.")
@@ -81,24 +121,30 @@ def get_llm(load_from_hugging_face=False):
         return ChatHuggingFace(llm=llm)
 
     # Default: OpenAI GPT-4o
+    from langchain_openai import ChatOpenAI
     return ChatOpenAI(model="gpt-4o", temperature=0.0)
 
 
 # -------------------------------------------------------
 # 4️⃣ SQL Query Generation Chain
 # -------------------------------------------------------
-def write_sql_query(llm):
-    """Chain that converts a user question into a SQL query."""
-    template = """Based on the table schema below, write a SQL query that would answer the user's question:
-    {schema}
+def sql_message_chain(llm):
+    """Chain that returns the raw LLM message for a SQL query, keeping its usage metadata."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.runnables import RunnablePassthrough
 
-    Question: {question}
-    SQL Query:"""
+    # Static schema goes first so providers can reuse the cached prompt prefix
+    system_template = """Given an input question, convert it to a SQL query.
+Return only the SQL query — no markdown, no code fences, no explanations.
+
+Based on the table schema below, write a SQL query that would answer the user's question:
+{schema}"""
+
+    template = """Question: {question}
+SQL Query:"""
 
     prompt = ChatPromptTemplate.from_messages([
-        ("system",
-         "Given an input question, convert it to a SQL query. "
-         "Return only the SQL query — no markdown, no code fences, no explanations."),
+        ("system", system_template),
         ("human", template),
     ])
 
@@ -106,6 +152,16 @@ def write_sql_query(llm):
         RunnablePassthrough.assign(schema=get_schema)
         | prompt
         | llm
+    )
+
+
+def write_sql_query(llm):
+    """Chain that converts a user question into a SQL query."""
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.runnables import RunnableLambda
+
+    return (
+        sql_message_chain(llm)
         | StrOutputParser()
         | RunnableLambda(clean_sql_output)
     )
@@ -114,53 +170,185 @@ def write_sql_query(llm):
 # -------------------------------------------------------
 # 5️⃣ Full Response Chain (SQL + Natural Language)
 # -------------------------------------------------------
-def answer_user_query(question: str, llm):
-    """Generate SQL, run it, and return both SQL + natural language answer."""
-    try:
-        # Step 1: Generate SQL from question
-        sql_query = write_sql_query(llm).invoke({"question": question})
-        cleaned_query = clean_sql_output(sql_query)
+_ANSWER_SYSTEM_TEMPLATE = """You are an analytical assistant. Answer clearly and factually.
 
-        # Step 2: Execute SQL
-        sql_response = run_query(cleaned_query)
+Based on the table schema below, question, SQL query, and SQL response,
+write a natural language answer.
 
-        # Step 3: Generate final natural-language answer
-        template = """Based on the table schema below, question, SQL query, and SQL response,
-        write a natural language answer.
+{schema}"""
 
-        {schema}
+_ANSWER_TEMPLATE = """Question: {question}
+SQL Query: {query}
+SQL Response: {response}"""
 
-        Question: {question}
-        SQL Query: {query}
-        SQL Response: {response}"""
+@functools.cache
+def _answer_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
 
-        prompt_response = ChatPromptTemplate.from_messages([
-            ("system", "You are an analytical assistant. Answer clearly and factually."),
-            ("human", template),
-        ])
+    return ChatPromptTemplate.from_messages([
+        ("system", _ANSWER_SYSTEM_TEMPLATE),
+        ("human", _ANSWER_TEMPLATE),
+    ]).partial(schema=get_schema())
 
-        result = (
-            prompt_response
-            | llm
-        ).invoke({
-            "schema": get_schema(None),
-            "question": question,
-            "query": cleaned_query,
-            "response": sql_response
-        })
 
-        answer_text = result.content if hasattr(result, "content") else str(result)
+def get_cached_tokens(message) -> int:
+    """Return the number of prompt tokens served from the provider's prefix cache."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("input_token_details", {}).get("cache_read", 0)
 
-        return {
-            "sql": cleaned_query,
-            "answer": answer_text
-        }
+
+# Default (OpenAI) model + SQL chain used by the Dash callback, built on first use
+@functools.cache
+def _default_llm():
+    return get_llm(load_from_hugging_face=False)
+
+
+@functools.cache
+def _default_sql_chain():
+    return sql_message_chain(_default_llm())
+
+
+def generate_answer(question: str, llm=None):
+    """Generate SQL, run it, and return both SQL + natural language answer (raises on failure)."""
+    if llm is None:
+        llm, sql_chain = _default_llm(), _default_sql_chain()
+    else:
+        sql_chain = sql_message_chain(llm)
+
+    # Step 1: Generate SQL from question (keep the message for its cache usage)
+    sql_message = sql_chain.invoke({"question": question})
+    sql_text = sql_message.content if hasattr(sql_message, "content") else str(sql_message)
+    cleaned_query = clean_sql_output(sql_text)
+
+    # Step 2: Execute SQL
+    sql_response = run_query(cleaned_query)
+
+    # Step 3: Generate final natural-language answer
+    result = (
+        _answer_prompt()
+        | llm
+    ).invoke({
+        "question": question,
+        "query": cleaned_query,
+        "response": sql_response
+    })
+
+    answer_text = result.content if hasattr(result, "content") else str(result)
+
+    # Both calls send the schema prefix, so report the cache hits of each
+    sql_cached = get_cached_tokens(sql_message)
+    answer_cached = get_cached_tokens(result)
+
+    return {
+        "sql": cleaned_query,
+        "answer": answer_text,
+        "cached_tokens": sql_cached + answer_cached,
+        "sql_cached_tokens": sql_cached,
+        "answer_cached_tokens": answer_cached,
+    }
+
+
+# -------------------------------------------------------
+# 5️⃣b Response Cache (exact + semantic)
+# -------------------------------------------------------
+_SIMILARITY_THRESHOLD = 0.92
+_CACHE_TTL = 3600
+
+# normalized question -> result dict (exact repeats skip the embedding call too)
+_EXACT_CACHE = TTLCache(maxsize=512, ttl=_CACHE_TTL)
+# normalized question -> (unit embedding vector, result dict)
+_SEMANTIC_CACHE = TTLCache(maxsize=512, ttl=_CACHE_TTL)
+_CACHE_LOCK = threading.Lock()
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase and collapse whitespace so trivial variations share a cache key."""
+    return " ".join(question.lower().split())
+
+
+@functools.cache
+def _embeddings():
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model="text-embedding-3-small")
+
+
+def embed_question(question: str):
+    """Return the question embedding as a unit-length float32 vector, or None on failure."""
+    try:
+        vec = np.asarray(_embeddings().embed_query(question), dtype=np.float32)
+    except Exception as e:
+        print(f"⚠️ Embedding failed, skipping semantic cache: {e}")
+        return None
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else None
+
+
+def lookup_semantic_cache(vec):
+    """Return the cached result whose question is most similar to ``vec``, if above threshold."""
+    with _CACHE_LOCK:
+        entries = list(_SEMANTIC_CACHE.values())
+    if not entries:
+        return None
+
+    # Vectors are unit length, so a single matmul gives every cosine similarity
+    scores = np.stack([v for v, _ in entries]) @ vec
+    best = int(np.argmax(scores))
+    if scores[best] > _SIMILARITY_THRESHOLD:
+        return entries[best][1]
+    return None
+
+
+def _served_from_cache(result, source):
+    """Copy of a cached result marked as local-cache hit; no provider call means no cached tokens."""
+    return {
+        **result,
+        "cached_tokens": 0,
+        "sql_cached_tokens": 0,
+        "answer_cached_tokens": 0,
+        "from_cache": source,
+    }
+
+
+def cached_answer(question: str):
+    """Answer with the default LLM, reusing results for repeated or near-duplicate questions."""
+    key = normalize_question(question)
+    with _CACHE_LOCK:
+        hit = _EXACT_CACHE.get(key)
+    if hit is not None:
+        return _served_from_cache(hit, "exact")
+
+    vec = embed_question(key)
+
+    if vec is not None:
+        hit = lookup_semantic_cache(vec)
+        if hit is not None:
+            print(f"♻️ Semantic cache hit for: {question}")
+            return _served_from_cache(hit, "semantic")
+
+    result = generate_answer(question)
+
+    with _CACHE_LOCK:
+        _EXACT_CACHE[key] = result
+        if vec is not None:
+            _SEMANTIC_CACHE[key] = (vec, result)
+    return result
+
+
+def answer_user_query(question: str, llm=None):
+    """Generate SQL, run it, and return both SQL + natural language answer."""
+    try:
+        if llm is None:
+            return cached_answer(question)
+        return generate_answer(question, llm)
 
     except Exception as e:
         print(f"❌ Error during processing: {e}")
         return {
             "sql": "",
-            "answer": f"❌ Error: {str(e)}"
+            "answer": f"❌ Error: {str(e)}",
+            "cached_tokens": 0,
+            "sql_cached_tokens": 0,
+            "answer_cached_tokens": 0,
         }
 
 
@@ -173,6 +361,8 @@ if __name__ == "__main__":
     result = answer_user_query(query, llm)
     print("\n🧠 SQL Generated:\n", result["sql"])
     print("\n💬 Final Answer:\n", result["answer"])
+    print("\n♻️ Cached prompt tokens:", result["cached_tokens"],
+          f"(SQL {result['sql_cached_tokens']} + answer {result['answer_cached_tokens']})")
 
 
 # -------------------------------------------------------
@@ -237,60 +427,78 @@ def process_question(n_clicks, user_question, mode):
         return "", "", "⚠️ Please enter a question."
     
     try:
-       if mode == "manual":
-        cleaned = clean_sql_output(user_question)
-
-        try:
-            df = pd.read_sql(cleaned, db._engine)
-        except Exception as e:
-            return "", "", f"❌ SQL Error: {str(e)}"
-
-        sql_block = dbc.Card([
-            dbc.CardHeader("📄 Executed SQL (User-provided)"),
-            dbc.CardBody(html.Pre(cleaned))
-        ])
+        if mode == "manual":
+            query = clean_sql_output(user_question)
+            cleaned = apply_row_limit(query)
+
+            try:
+                df, truncated = read_sql_capped(cleaned)
+            except Exception as e:
+                return "", "", f"❌ SQL Error: {str(e)}"
+            # Reaching our own auto-added LIMIT also means rows were cut
+            truncated = truncated or (cleaned != query and len(df) >= MANUAL_ROW_LIMIT)
+
+            sql_block = dbc.Card([
+                dbc.CardHeader("📄 Executed SQL (User-provided)"),
+                dbc.CardBody(html.Pre(cleaned))
+            ])
+
+            if df.empty:
+                result_table = dbc.Alert("⚠️ Query returned no rows.", color="warning")
+            else:
+                # AG Grid virtualizes rows, so large result sets stay responsive
+                result_table = dag.AgGrid(
+                    id="table-sql-result",
+                    columnDefs=[{"field": c} for c in df.columns],
+                    rowData=df.to_dict("records"),
+                    defaultColDef={"sortable": True, "filter": True, "resizable": True},
+                    dashGridOptions={"pagination": True, "paginationPageSize": 50, "suppressFieldDotNotation": True},
+                    style={"width": "100%"},
+                )
+
+            if truncated:
+                result_table = [
+                    dbc.Alert(f"⚠️ Result truncated: showing the first {MANUAL_ROW_LIMIT:,} rows.", color="warning"),
+                    result_table,
+                ]
+
+            result_block = dbc.Card([
+                dbc.CardHeader("📊 SQL Result (Formatted Table)"),
+                dbc.CardBody(result_table)
+            ])
+
+            return sql_block, result_block, ""
 
-        if df.empty:
-            result_table = dbc.Alert("⚠️ Query returned no rows.", color="warning")
         else:
-            result_table = dash_table.DataTable(
-                id="table-sql-result",
-                columns=[{"name": c, "id": c} for c in df.columns],
-                data=df.to_dict("records"),
-                filter_action="native",
-                sort_action="native",
-                page_size=20,
-                style_table={'overflowX': 'auto'},
-            )
-
-        result_block = dbc.Card([
-            dbc.CardHeader("📊 SQL Result (Formatted Table)"),
-            dbc.CardBody(result_table)
-        ])
-
-        return sql_block, result_block, ""
-
-
-        # ----------------------------------------------------
-        # LLM MODE (your original logic)
-        # ----------------------------------------------------
-        llm = get_llm(load_from_hugging_face=False)
-        response = answer_user_query(user_question, llm)
-
-        sql_query = response.get("sql", "SQL query not detected.")
-        nl_answer = response.get("answer", "")
-
-        sql_block = dbc.Card([
-            dbc.CardHeader("🧠 Generated SQL Query"),
-            dbc.CardBody(html.Pre(sql_query))
-        ])
-
-        nl_answer_block = dbc.Card([
-            dbc.CardHeader("💬 Answer"),
-            dbc.CardBody(html.Div(nl_answer))
-        ])
-
-        return sql_block, nl_answer_block, ""
+            # ----------------------------------------------------
+            # LLM MODE (your original logic)
+            # ----------------------------------------------------
+            response = answer_user_query(user_question)
+
+            sql_query = response.get("sql", "SQL query not detected.")
+            nl_answer = response.get("answer", "")
+
+            sql_block = dbc.Card([
+                dbc.CardHeader("🧠 Generated SQL Query"),
+                dbc.CardBody(html.Pre(sql_query))
+            ])
+
+            from_cache = response.get("from_cache")
+            if from_cache:
+                footer = f"♻️ Served from local {from_cache}-match cache (no LLM call)"
+            else:
+                footer = (
+                    f"♻️ Cached prompt tokens: {response.get('cached_tokens', 0)} "
+                    f"(SQL {response.get('sql_cached_tokens', 0)} + answer {response.get('answer_cached_tokens', 0)})"
+                )
+
+            nl_answer_block = dbc.Card([
+                dbc.CardHeader("💬 Answer"),
+                dbc.CardBody(html.Div(nl_answer)),
+                dbc.CardFooter(footer, className="text-muted small"),
+            ])
+
+            return sql_block, nl_answer_block, ""
 
     except Exception as e:
         tb = traceback.format_exc(limit=2)
@@ -1,14 +1,16 @@
 # pages/page2.py
 
 import dash
-from dash import dcc, html, callback, Output, Input
+from dash import dcc, html, callback, clientside_callback, Output, Input, State
 import dash_bootstrap_components as dbc
-import pickle
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import plotly.io as plt_io
+import numpy as np
 import pandas as pd
 
+from cache import cache
+
 # ----------------------------------------------------------
 # Page registration (multipage)
 # ----------------------------------------------------------
@@ -22,11 +24,108 @@ dash.register_page(
 # ----------------------------------------------------------
 # Data loading
 # ----------------------------------------------------------
-with open("./Data/COLLATE/MM.pkl", "rb") as fp:
-    COLLATE_MM = pickle.load(fp)
+# Only the columns the chart needs (exported by "Agent and NLP.ipynb")
+COLLATE_MM = pd.read_parquet(
+    "./Data/COLLATE/MM.parquet",
+    engine="pyarrow",
+    columns=["date", "Youtube_Handle", "likes", "views"],
+    memory_map=True
+)
 
-# Ensure datetime type
+# Ensure datetime type, then index by date so range filters are sorted slices
 COLLATE_MM["date"] = pd.to_datetime(COLLATE_MM["date"], errors="coerce")
+COLLATE_MM = COLLATE_MM.set_index("date").sort_index()
+
+# Pre-reduce to one row per (day, handle); callbacks only re-sum the date window
+DAILY_AGG = (
+    COLLATE_MM.groupby([pd.Grouper(freq="D"), "Youtube_Handle"])
+              .agg(
+                  Sum_Likes=("likes", "sum"),
+                  Sum_Views=("views", "sum"),
+                  Count_Videos=("likes", "size")
+              )
+)
+
+# Sorted day of each DAILY_AGG row, for binary-search date windows
+_DAYS = DAILY_AGG.index.get_level_values("date").values
+
+
+def date_window(start_date, end_date):
+    """Return the DAILY_AGG rows between two dates (inclusive) via searchsorted."""
+    lo, hi = 0, len(_DAYS)
+    if start_date is not None:
+        lo = np.searchsorted(_DAYS, pd.Timestamp(start_date).to_datetime64())
+    if end_date is not None:
+        hi = np.searchsorted(_DAYS, pd.Timestamp(end_date).to_datetime64(), side="right")
+    return DAILY_AGG.iloc[lo:hi]
+
+# ----------------------------------------------------------
+# Theme (registered once at import, not per callback)
+# ----------------------------------------------------------
+red = "#DF1111"
+yellow = "#A2CB1C"
+dark = "#30404D"
+
+# Custom dark gridlines; copy plotly_dark so the built-in template stays untouched
+plt_io.templates["custom_dark"] = go.layout.Template(plt_io.templates["plotly_dark"])
+plt_io.templates["custom_dark"]["layout"]["paper_bgcolor"] = dark
+plt_io.templates["custom_dark"]["layout"]["plot_bgcolor"] = dark
+plt_io.templates["custom_dark"]["layout"]["yaxis"]["gridcolor"] = "#4f687d"
+plt_io.templates["custom_dark"]["layout"]["xaxis"]["gridcolor"] = "#4f687d"
+
+# ----------------------------------------------------------
+# Base figure (built once; the clientside callback fills its data)
+# ----------------------------------------------------------
+BARLINE_FIG = make_subplots(specs=[[{"secondary_y": True}]])
+
+# Bar for views
+BARLINE_FIG.add_trace(
+    go.Bar(
+        x=[],
+        y=[],
+        name="Total Views",
+        marker_color=red
+    ),
+    secondary_y=False
+)
+
+# Line for likes
+BARLINE_FIG.add_trace(
+    go.Scatter(
+        x=[],
+        y=[],
+        name="Total Likes",
+        mode="lines+markers",
+        marker=dict(color=yellow, size=8)
+    ),
+    secondary_y=True
+)
+
+# Axes + Title
+BARLINE_FIG.update_xaxes(title_text="YouTube Channel Handle", tickangle=45)
+BARLINE_FIG.update_yaxes(
+    title_text="Total Views",
+    secondary_y=False,
+    title_font_color=red,
+    tickfont=dict(color=red)
+)
+BARLINE_FIG.update_yaxes(
+    title_text="Total Likes",
+    secondary_y=True,
+    title_font_color=yellow,
+    tickfont=dict(color=yellow)
+)
+
+BARLINE_FIG.update_layout(
+    template="custom_dark",
+    title_text="Views vs Likes by YouTube Handle",
+    legend=dict(x=1, y=1, xanchor='right', yanchor='top'),
+    height=500,
+    margin=dict(l=50, r=50, b=80, t=80),
+    plot_bgcolor=dark,
+    paper_bgcolor=dark,
+    font=dict(color="white")
+)
 
 # ----------------------------------------------------------
 # Page layout
@@ -40,8 +139,8 @@ layout = dbc.Container([
             dcc.DatePickerRange(
                 id="date-range-picker",
                 display_format="YYYY-MM-DD",
-                start_date=COLLATE_MM["date"].min().strftime("%Y-%m-%d"),
-                end_date=COLLATE_MM["date"].max().strftime("%Y-%m-%d"),
+                start_date=COLLATE_MM.index.min().strftime("%Y-%m-%d"),
+                end_date=COLLATE_MM.index.max().strftime("%Y-%m-%d"),
                 clearable=True,
                 className="css_date_range_picker"
             )
@@ -72,108 +171,78 @@ layout = dbc.Container([
 
     dbc.Row([
         dbc.Col([
-            dcc.Graph(id="barline-fig", figure={})
+            dcc.Graph(id="barline-fig", figure=BARLINE_FIG)
         ], width=12)
-    ])
+    ]),
+
+    # Per-handle totals for the selected dates; sorting happens in the browser
+    dcc.Store(id="barline-store")
 ], fluid=True)
 
 # ----------------------------------------------------------
-# Callback: update chart + KPIs
+# Callback: aggregate the date window + KPIs (server)
 # ----------------------------------------------------------
-@callback(
-    Output("barline-fig", "figure"),
-    Output("dash-total-videos", "children"),
-    Input("date-range-picker", "start_date"),
-    Input("date-range-picker", "end_date"),
-    Input("sort-toggle", "value")
-)
-def update_barline_all(start_date, end_date, sort_by):
-    # Filter by date
-    df = COLLATE_MM[(COLLATE_MM["date"] >= start_date) & (COLLATE_MM["date"] <= end_date)]
-
-    # Group and aggregate
+@cache.memoize()
+def aggregate_window(start_date, end_date):
+    """Per-handle totals + video count for a date window (memoized per window)."""
+    # Slice the daily buckets by date and combine them per handle
     agg_df = (
-        df.groupby("Youtube_Handle", as_index=False)
-          .agg(
-              Sum_Likes=("likes", "sum"),
-              Sum_Views=("views", "sum"),
-              Count_Videos=("Youtube_Handle", "count")
-          )
+        date_window(start_date, end_date)
+        .groupby(level="Youtube_Handle")
+        .sum()
+        .reset_index()
     )
 
-    # Sort by selected metric
-    sort_col = "Sum_Views" if sort_by == "views" else "Sum_Likes"
-    agg_df = agg_df.sort_values(sort_col, ascending=False)
-
     num_videos = int(agg_df["Count_Videos"].sum())
 
-    # ------------------------------------
-    # 🎨 Create Bar + Line figure
-    # ------------------------------------
-    red = "#DF1111"
-    yellow = "#A2CB1C"
-    dark = "#30404D"
-
-    fig_barline = make_subplots(specs=[[{"secondary_y": True}]])
-
-    # Bar for views
-    fig_barline.add_trace(
-        go.Bar(
-            x=agg_df["Youtube_Handle"],
-            y=agg_df["Sum_Views"],
-            name="Total Views",
-            marker_color=red
-        ),
-        secondary_y=False
-    )
+    store = {
+        "handles": agg_df["Youtube_Handle"].tolist(),
+        "views": agg_df["Sum_Views"].tolist(),
+        "likes": agg_df["Sum_Likes"].tolist()
+    }
 
-    # Line for likes
-    fig_barline.add_trace(
-        go.Scatter(
-            x=agg_df["Youtube_Handle"],
-            y=agg_df["Sum_Likes"],
-            name="Total Likes",
-            mode="lines+markers",
-            marker=dict(color=yellow, size=8)
-        ),
-        secondary_y=True
-    )
+    return store, f"{num_videos:,}"
 
-    # ------------------------------------
-    # Axes + Title
-    # ------------------------------------
-    fig_barline.update_xaxes(title_text="YouTube Channel Handle", tickangle=45)
-    fig_barline.update_yaxes(
-        title_text="Total Views",
-        secondary_y=False,
-        title_font_color=red,
-        tickfont=dict(color=red)
-    )
-    fig_barline.update_yaxes(
-        title_text="Total Likes",
-        secondary_y=True,
-        title_font_color=yellow,
-        tickfont=dict(color=yellow)
-    )
 
-    title_suffix = "Views" if sort_by == "views" else "Likes"
-    fig_barline.update_layout(
-        title_text=f"Views vs Likes by YouTube Handle (Sorted by {title_suffix})",
-        legend=dict(x=1, y=1, xanchor='right', yanchor='top'),
-        height=500,
-        margin=dict(l=50, r=50, b=80, t=80),
-        plot_bgcolor=dark,
-        paper_bgcolor=dark,
-        font=dict(color="white")
-    )
-
-    # Custom dark gridlines
-    plt_io.templates["custom_dark"] = plt_io.templates["plotly_dark"]
-    plt_io.templates["custom_dark"]["layout"]["paper_bgcolor"] = dark
-    plt_io.templates["custom_dark"]["layout"]["plot_bgcolor"] = dark
-    plt_io.templates["custom_dark"]["layout"]["yaxis"]["gridcolor"] = "#4f687d"
-    plt_io.templates["custom_dark"]["layout"]["xaxis"]["gridcolor"] = "#4f687d"
+@callback(
+    Output("barline-store", "data"),
+    Output("dash-total-videos", "children"),
+    Input("date-range-picker", "start_date"),
+    Input("date-range-picker", "end_date")
+)
+def update_barline_all(start_date, end_date):
+    return aggregate_window(start_date, end_date)
 
-    fig_barline.update_layout(template="custom_dark")
 
-    return fig_barline, f"{num_videos:,}"
+# ----------------------------------------------------------
+# Callback: sort + draw the chart (clientside, no round-trip)
+# ----------------------------------------------------------
+clientside_callback(
+    """
+    function(sortBy, store, fig) {
+        if (!store || !fig) {
+            return window.dash_clientside.no_update;
+        }
+        const key = sortBy === "likes" ? "likes" : "views";
+        const order = store.handles.map((_, i) => i)
+            .sort((a, b) => store[key][b] - store[key][a]);
+        const pick = (arr) => order.map((i) => arr[i]);
+        const handles = pick(store.handles);
+
+        const data = [
+            {...fig.data[0], x: handles, y: pick(store.views)},
+            {...fig.data[1], x: handles, y: pick(store.likes)}
+        ];
+        const suffix = key === "views" ? "Views" : "Likes";
+        const layout = {
+            ...fig.layout,
+            title: {...fig.layout.title, text: `Views vs Likes by YouTube Handle (Sorted by ${suffix})`}
+        };
+        return {...fig, data: data, layout: layout};
+    }
+    """,
+    Output("barline-fig", "figure"),
+    Input("sort-toggle", "value"),
+    Input("barline-store", "data"),
+    State("barline-fig", "figure")
+)
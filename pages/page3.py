@@ -1,12 +1,11 @@
 # pages/page3.py
 
 import dash
-from dash import dcc, html, callback, Input, Output
+from dash import dcc, html, callback, Input, Output, Patch
 import dash_bootstrap_components as dbc
-import pickle
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import random
+import plotly.graph_objects as go
 
 # ----------------------------------------------------------
 # Page registration (multipage)
@@ -21,13 +20,71 @@ dash.register_page(
 # ----------------------------------------------------------
 # Data loading
 # ----------------------------------------------------------
-with open('./Data/COLLATE/COMMENT_sentiment_deduplicated.pkl', 'rb') as fp:
-    COLLATE_COMMENT = pickle.load(fp)
+# Only the columns the page needs (exported by "Agent and NLP.ipynb")
+COLLATE_COMMENT = pd.read_parquet(
+    "./Data/COLLATE/COMMENT_sentiment_deduplicated.parquet",
+    engine="pyarrow",
+    columns=[
+        "Youtube_Handle", "Youtube_Video_IDs", "sentiment",
+        "full_comment", "translated_text", "detected_lang"
+    ],
+    memory_map=True
+)
 
-# Ensure correct dtypes
-COLLATE_COMMENT["sentiment"] = COLLATE_COMMENT["sentiment"].astype(str)
-COLLATE_COMMENT["Youtube_Handle"] = COLLATE_COMMENT["Youtube_Handle"].astype(str)
+# Ensure correct dtypes; low-cardinality keys become categoricals for cheap grouping
 COLLATE_COMMENT["Youtube_Video_IDs"] = COLLATE_COMMENT["Youtube_Video_IDs"].astype(str)
+for c in ("sentiment", "Youtube_Handle"):
+    COLLATE_COMMENT[c] = COLLATE_COMMENT[c].astype(str).astype("category")
+
+# Comment counts per handle (rows) and sentiment (columns), computed once
+SENTIMENT_COUNTS = (
+    COLLATE_COMMENT.groupby(["Youtube_Handle", "sentiment"], observed=True)
+    .size()
+    .unstack(fill_value=0)
+)
+
+# {handle: {sentiment: comments}} so sampling never re-masks the full table
+BY_HANDLE_SENTIMENT = {
+    h: {s: g for s, g in grp.groupby("sentiment", observed=True)}
+    for h, grp in COLLATE_COMMENT.groupby("Youtube_Handle", observed=True)
+}
+
+# Dropdown options, computed once rather than on every layout evaluation
+HANDLE_OPTIONS = [
+    {"label": h, "value": h}
+    for h in sorted(COLLATE_COMMENT["Youtube_Handle"].unique().tolist())
+]
+
+# Shared generator for sampling comments
+_RNG = np.random.default_rng()
+
+# ----------------------------------------------------------
+# Base figure (built once; callbacks patch its data)
+# ----------------------------------------------------------
+SENTIMENT_COLORS = {
+    "positive": "#A2CB1C",
+    "neutral": "#F7C948",
+    "negative": "#DF1111"
+}
+SENTIMENTS = tuple(SENTIMENT_COLORS)
+
+# One trace per sentiment so each keeps its colour and legend entry
+SENTIMENT_FIG = go.Figure([
+    go.Bar(x=[], y=[], name=s, marker_color=color, texttemplate="%{y}")
+    for s, color in SENTIMENT_COLORS.items()
+])
+
+SENTIMENT_FIG.update_layout(
+    title_text="Sentiment Distribution",
+    xaxis_title="sentiment",
+    yaxis_title="comment_count",
+    legend_title_text="sentiment",
+    barmode="relative",
+    plot_bgcolor="#30404D",
+    paper_bgcolor="#30404D",
+    font=dict(color="white"),
+    height=400
+)
 
 # ----------------------------------------------------------
 # Layout
@@ -41,7 +98,7 @@ layout = dbc.Container([
             html.Label("Select a YouTube Channel Handle:"),
             dcc.Dropdown(
                 id="handle-dropdown",
-                options=[{"label": h, "value": h} for h in sorted(COLLATE_COMMENT["Youtube_Handle"].unique())],
+                options=HANDLE_OPTIONS,
                 value=None,
                 placeholder="Select a YouTube handle...",
                 className="mb-4"
@@ -52,7 +109,7 @@ layout = dbc.Container([
     # Sentiment distribution chart
     dbc.Row([
         dbc.Col([
-            dcc.Graph(id="sentiment-bar-chart", figure={})
+            dcc.Graph(id="sentiment-bar-chart", figure=SENTIMENT_FIG)
         ], width=12)
     ]),
 
@@ -77,62 +134,44 @@ layout = dbc.Container([
 )
 def update_comment_insights(selected_handle):
     if not selected_handle:
-        return {}, html.P("Please select a YouTube handle to view insights.", className="text-muted")
+        return SENTIMENT_FIG, html.P("Please select a YouTube handle to view insights.", className="text-muted")
 
     # -------------------------------------
-    # 🧮 Sentiment aggregation
+    # 🧮 Sentiment aggregation (precomputed lookup)
     # -------------------------------------
-    grouped = (
-        COLLATE_COMMENT.groupby(["Youtube_Handle", "sentiment"])
-        .agg(comment_count=pd.NamedAgg(column="sentiment", aggfunc="count"))
-    )
-
-    if selected_handle not in grouped.index.get_level_values(0):
-        return {}, html.P(f"No comments found for {selected_handle}.", className="text-danger")
+    if selected_handle not in SENTIMENT_COUNTS.index:
+        return SENTIMENT_FIG, html.P(f"No comments found for {selected_handle}.", className="text-danger")
 
-    filtered_data = grouped.loc[selected_handle].reset_index()
+    counts = SENTIMENT_COUNTS.loc[selected_handle]
 
     # -------------------------------------
-    # 📊 Bar chart
+    # 📊 Bar chart (patch the prebuilt figure)
     # -------------------------------------
-    fig = px.bar(
-        filtered_data,
-        x="sentiment",
-        y="comment_count",
-        color="sentiment",
-        title=f"Sentiment Distribution for {selected_handle}",
-        text_auto=True,
-        color_discrete_map={
-            "positive": "#A2CB1C",
-            "neutral": "#F7C948",
-            "negative": "#DF1111"
-        }
-    )
-
-    fig.update_layout(
-        plot_bgcolor="#30404D",
-        paper_bgcolor="#30404D",
-        font=dict(color="white"),
-        height=400
-    )
+    fig = Patch()
+    for i, s in enumerate(SENTIMENTS):
+        count = int(counts.get(s, 0))
+        fig["data"][i]["x"] = [s] if count else []
+        fig["data"][i]["y"] = [count] if count else []
+    fig["layout"]["title"]["text"] = f"Sentiment Distribution for {selected_handle}"
 
     # -------------------------------------
     # 💬 Sample comments by sentiment
     # -------------------------------------
     samples_section = []
-    sentiments = ["positive", "neutral", "negative"]
 
-    df_selected = COLLATE_COMMENT[COLLATE_COMMENT["Youtube_Handle"] == selected_handle]
+    by_sentiment = BY_HANDLE_SENTIMENT.get(selected_handle, {})
 
-    for s in sentiments:
-        df_sent = df_selected[df_selected["sentiment"] == s]
-        if df_sent.empty:
+    for s in SENTIMENTS:
+        df_sent = by_sentiment.get(s)
+        if df_sent is None or df_sent.empty:
             continue
 
-        sampled_rows = df_sent.sample(min(5, len(df_sent)), random_state=random.randint(0, 9999))
+        k = min(5, len(df_sent))
+        idx = _RNG.choice(len(df_sent), size=k, replace=False)
+        sampled_rows = df_sent.iloc[idx]
 
         # Create a nice list of cards for each sentiment
-        sentiment_color = {"positive": "#A2CB1C", "neutral": "#F7C948", "negative": "#DF1111"}[s]
+        sentiment_color = SENTIMENT_COLORS[s]
         cards = []
 
         for _, row in sampled_rows.iterrows():